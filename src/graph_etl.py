@@ -5,227 +5,749 @@ Graph ETL Pipeline - Transform relational data into graph structures
 
 import pandas as pd
 import numpy as np
-from neo4j import GraphDatabase
+from neo4j import AsyncGraphDatabase, GraphDatabase
+from neo4j.exceptions import ClientError, TransientError
+import argparse
+import asyncio
 import logging
-from typing import Dict, List, Any
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Any, NamedTuple, Optional, Sequence, Tuple
 import json
 from datetime import datetime
 
-class GraphETLPipeline:
+def _iter_records(df: pd.DataFrame, cols: Sequence[str], block_size: int = 10000) -> Iterator[Dict[str, Any]]:
+    """Yield rows of df as dicts of native Python values, converting one row block at a time"""
+    # Categorical columns are expanded to their string values here, at the last moment
+    records = df[list(cols)].to_records(index=False)
+    for start in range(0, len(records), block_size):
+        # Structured-array tolist() builds the row tuples of native values in C
+        for values in records[start:start + block_size].tolist():
+            yield dict(zip(cols, values))
+
+def _format_dates(df: pd.DataFrame, cols: Sequence[str]) -> pd.DataFrame:
+    """Return df with date columns as 'YYYY-MM-DD' strings for server-side date() parsing"""
+    return df.assign(**{c: pd.to_datetime(df[c]).dt.strftime('%Y-%m-%d') for c in cols})
+
+async def _gather_cancelling(*aws):
+    """Await aws concurrently; on the first failure cancel the rest and wait for them before re-raising"""
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+class _Step(NamedTuple):
+    """One query a pipeline stage asks its driver to execute"""
+    kind: str  # 'run' consumes an auto-commit result, 'single' returns its one record, 'write' uses execute_write
+    query: str
+    params: Dict[str, Any] = {}
+
+def _shards(df: pd.DataFrame, shard_col: str, workers: int) -> List[pd.DataFrame]:
+    """Split df into at most workers frames by shard_col, keeping row order within each"""
+    # Shard the frame rather than the records so each worker builds only its current batch of dicts
+    return [shard_df for _, shard_df in df.groupby(df[shard_col] % workers, sort=False)]
+
+def _prepare_orders(orders_df: pd.DataFrame) -> pd.DataFrame:
+    """Sort orders by the MATCH keys and format dates for loading"""
+    # Sort by the MATCH keys so adjacent rows seek neighbouring index entries
+    orders_df = orders_df.sort_values(['customer_id', 'product_id'], kind='mergesort')
+    return _format_dates(orders_df, ['order_date'])
+
+class _PipelineStages:
+    """Queries and per-stage control flow shared by the sync and async pipelines
+    
+    Each *_steps method is a generator that yields _Step objects and receives each
+    step's result (or has its error thrown in), so the stage logic is written once
+    and executed by GraphETLPipeline._drive or AsyncGraphETLPipeline._drive.
+    """
+    # Only the columns each Cypher load references are shipped over Bolt
+    CUSTOMER_COLS = ['id', 'name', 'email', 'city', 'country', 'segment', 'registration_date', 'lifetime_value']
+    PRODUCT_COLS = ['id', 'name', 'category', 'price', 'cost', 'margin', 'launch_date']
+    ORDER_COLS = ['id', 'customer_id', 'product_id', 'order_date', 'quantity', 'unit_price', 'total_amount', 'discount']
+    
+    CONSTRAINTS = [
+        "CREATE CONSTRAINT customer_id IF NOT EXISTS FOR (c:Customer) REQUIRE c.id IS UNIQUE",
+        "CREATE CONSTRAINT product_id IF NOT EXISTS FOR (p:Product) REQUIRE p.id IS UNIQUE",
+        "CREATE CONSTRAINT order_id IF NOT EXISTS FOR (o:Order) REQUIRE o.id IS UNIQUE",
+        "CREATE CONSTRAINT category_name IF NOT EXISTS FOR (c:Category) REQUIRE c.name IS UNIQUE"
+    ]
+    
+    CUSTOMER_QUERY = """
+    UNWIND $customers AS customer
+    CREATE (c:Customer {
+        id: customer.id,
+        name: customer.name,
+        email: customer.email,
+        city: customer.city,
+        country: customer.country,
+        segment: customer.segment,
+        registration_date: date(customer.registration_date),
+        lifetime_value: customer.lifetime_value
+    })
+    """
+    
+    # Create products and link them to their category in the same pass
+    PRODUCT_QUERY = """
+    UNWIND $products AS product
+    CREATE (p:Product {
+        id: product.id,
+        name: product.name,
+        category: product.category,
+        price: product.price,
+        cost: product.cost,
+        margin: product.margin,
+        launch_date: date(product.launch_date)
+    })
+    MERGE (c:Category {name: product.category})
+    MERGE (p)-[:BELONGS_TO]->(c)
+    """
+    
+    ORDER_QUERY = """
+    UNWIND $orders AS order
+    MATCH (c:Customer {id: order.customer_id}) USING INDEX c:Customer(id)
+    MATCH (p:Product {id: order.product_id}) USING INDEX p:Product(id)
+    CREATE (o:Order {
+        id: order.id,
+        order_date: date(order.order_date),
+        quantity: order.quantity,
+        unit_price: order.unit_price,
+        total_amount: order.total_amount,
+        discount: order.discount
+    })
+    CREATE (c)-[:PLACED]->(o)
+    CREATE (o)-[:CONTAINS]->(p)
+    """
+    
+    SIMILARITY_QUERY = """
+    MATCH (c1:Customer)-[:PLACED]->(:Order)-[:CONTAINS]->(p:Product)
+    MATCH (c2:Customer)-[:PLACED]->(:Order)-[:CONTAINS]->(p)
+    WHERE c1.id < c2.id
+    WITH c1, c2, count(p) as common_products
+    WHERE common_products >= 2
+    CALL {
+        WITH c1, c2, common_products
+        CREATE (c1)-[:SIMILAR_TO {strength: common_products}]->(c2)
+    } IN TRANSACTIONS OF 10000 ROWS
+    """
+    
+    SIMILARITY_GDS_DROP_QUERY = "CALL gds.graph.drop('cust-prod', false) YIELD graphName RETURN graphName"
+    
+    # Collapse Customer-PLACED->Order-CONTAINS->Product into a bipartite Customer->Product graph
+    SIMILARITY_GDS_PROJECTION_QUERY = """
+    CALL gds.graph.project.cypher(
+        'cust-prod',
+        'MATCH (c:Customer) RETURN id(c) AS id, labels(c) AS labels
+         UNION
+         MATCH (p:Product) RETURN id(p) AS id, labels(p) AS labels',
+        'MATCH (c:Customer)-[:PLACED]->(:Order)-[:CONTAINS]->(p:Product)
+         RETURN id(c) AS source, id(p) AS target'
+    )
+    """
+    
+    SIMILARITY_GDS_QUERY = """
+    CALL gds.nodeSimilarity.write('cust-prod', {
+        writeRelationshipType: 'SIMILAR_TO',
+        writeProperty: 'strength',
+        similarityCutoff: 0.1,
+        topK: 20
+    })
+    YIELD relationshipsWritten
+    RETURN relationshipsWritten
+    """
+    
+    CO_PURCHASE_QUERY = """
+    MATCH (c:Customer)-[:PLACED]->(:Order)-[:CONTAINS]->(p:Product)
+    WITH c, collect(DISTINCT p) as products
+    UNWIND products as p1
+    UNWIND products as p2
+    WITH p1, p2
+    WHERE p1.id < p2.id
+    WITH p1, p2, count(*) as co_purchases
+    WHERE co_purchases >= 2
+    CALL {
+        WITH p1, p2, co_purchases
+        CREATE (p1)-[:CO_PURCHASED {frequency: co_purchases}]->(p2)
+    } IN TRANSACTIONS OF 10000 ROWS
+    """
+    
+    METRICS_QUERY = """
+    MATCH (c:Customer)-[:PLACED]->(o:Order)
+    WITH c,
+         count(o) as total_orders,
+         sum(o.total_amount) as total_spent,
+         avg(o.total_amount) as avg_order_value,
+         max(o.order_date) as last_order_date
+    SET c.total_orders = total_orders,
+        c.total_spent = total_spent,
+        c.avg_order_value = avg_order_value,
+        c.last_order_date = last_order_date,
+        c.customer_tier = CASE
+            WHEN total_spent > 5000 THEN 'VIP'
+            WHEN total_spent > 2000 THEN 'Premium'
+            ELSE 'Standard'
+        END
+    """
+    
+    # Each customer is aggregated and written by exactly one batch, so batches can run in parallel
+    METRICS_ITERATE_QUERY = """
+    CALL apoc.periodic.iterate(
+        'MATCH (c:Customer) RETURN c',
+        $inner,
+        {batchSize: 10000, parallel: true, concurrency: 8}
+    )
+    YIELD batches, failedBatches, errorMessages
+    RETURN batches, failedBatches, errorMessages
+    """
+    
+    # Yield only the write count: unyielded columns such as the distribution statistics are never computed
+    ANALYTICS_QUERIES = {
+        "pagerank": """
+            CALL gds.pageRank.write('customer-similarity', {
+                writeProperty: 'pagerank'
+            })
+            YIELD nodePropertiesWritten
+        """,
+        "community_detection": """
+            CALL gds.louvain.write('customer-similarity', {
+                writeProperty: 'community'
+            })
+            YIELD nodePropertiesWritten
+        """,
+        "centrality": """
+            CALL gds.betweenness.write('customer-similarity', {
+                writeProperty: 'betweenness'
+            })
+            YIELD nodePropertiesWritten
+        """
+    }
+    
+    # Dropped before projecting, so re-runs don't fail on a leftover graph, and again afterwards to free memory
+    ANALYTICS_DROP_QUERY = "CALL gds.graph.drop('customer-similarity', false) YIELD graphName RETURN graphName"
+    
+    ANALYTICS_PROJECTION_QUERY = """
+    CALL gds.graph.project(
+        'customer-similarity',
+        'Customer',
+        'SIMILAR_TO',
+        {
+            relationshipProperties: 'strength'
+        }
+    )
+    """
+    
+    def _clear_database_steps(self):
+        yield _Step('run', "MATCH (n) DETACH DELETE n")
+        self.logger.info("Database cleared")
+    
+    def _create_constraints_steps(self):
+        for constraint in self.CONSTRAINTS:
+            try:
+                yield _Step('run', constraint)
+                self.logger.info(f"Created constraint: {constraint}")
+            except Exception as e:
+                self.logger.warning(f"Constraint may already exist: {e}")
+        
+        # Block until the backing indexes are online so the first loader batch gets seek plans
+        yield _Step('run', "CALL db.awaitIndexes(300)")
+        self.logger.info("Constraint indexes online")
+    
+    def _batch_steps(self, query: str, rows: Iterable[Dict[str, Any]], key: str, batch_size: int = 1000,
+                     retries: int = 1, stop: Optional[threading.Event] = None):
+        """Run an UNWIND query over rows in batches, one managed write transaction per batch
+
+        Stops early, between batches, once stop is set.
+        """
+        rows = iter(rows)
+        total = 0
+        while stop is None or not stop.is_set():
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            # execute_write already retries TransientError until max_transaction_retry_time runs out.
+            # Concurrent order shards still deadlock on shared Product nodes, and that contention can
+            # outlast the window, so _parallel_ingest asks for a few more attempts; other loaders use 1.
+            for attempt in range(1, retries + 1):
+                try:
+                    yield _Step('write', query, {key: batch})
+                    break
+                except TransientError as e:
+                    if attempt == retries:
+                        raise
+                    self.logger.warning(f"Batch retry {attempt}/{retries} after transient error: {e}")
+            total += len(batch)
+        return total
+    
+    def _load_customers_steps(self, customers_df: pd.DataFrame):
+        customers_df = _format_dates(customers_df, ['registration_date'])
+        loaded = yield from self._batch_steps(self.CUSTOMER_QUERY, _iter_records(customers_df, self.CUSTOMER_COLS),
+                                              "customers")
+        self.logger.info(f"Loaded {loaded} customers")
+    
+    def _load_products_steps(self, products_df: pd.DataFrame):
+        products_df = _format_dates(products_df, ['launch_date'])
+        loaded = yield from self._batch_steps(self.PRODUCT_QUERY, _iter_records(products_df, self.PRODUCT_COLS),
+                                              "products")
+        self.logger.info(f"Loaded {loaded} products with category relationships")
+    
+    def _similarity_steps(self):
+        # CALL { } IN TRANSACTIONS only runs in an auto-commit transaction, so use a 'run' step
+        yield _Step('run', self.SIMILARITY_QUERY)
+        self.logger.info("Created customer similarity relationships")
+    
+    def _has_gds_steps(self):
+        record = yield _Step('single', "SHOW PROCEDURES YIELD name WHERE name = 'gds.nodeSimilarity.write' "
+                                       "RETURN count(*) > 0 AS available")
+        return record["available"]
+    
+    def _similarity_gds_steps(self):
+        try:
+            yield _Step('run', self.SIMILARITY_GDS_DROP_QUERY)
+            yield _Step('run', self.SIMILARITY_GDS_PROJECTION_QUERY)
+            yield _Step('run', self.SIMILARITY_GDS_QUERY)
+            yield _Step('run', self.SIMILARITY_GDS_DROP_QUERY)
+            self.logger.info("Created customer similarity relationships with GDS")
+        except Exception as e:
+            self.logger.error(f"GDS node similarity failed: {e}")
+            raise
+    
+    def _co_purchase_steps(self):
+        yield _Step('run', self.CO_PURCHASE_QUERY)
+        self.logger.info("Created product co-purchase relationships")
+    
+    def _metrics_steps(self):
+        try:
+            record = yield _Step('single', self.METRICS_ITERATE_QUERY, {'inner': "WITH c " + self.METRICS_QUERY})
+        except ClientError as e:
+            # Only a missing APOC falls back; any other failure may already have written some batches
+            if e.code != "Neo.ClientError.Procedure.ProcedureNotFound":
+                raise
+            self.logger.warning(f"apoc.periodic.iterate not available, falling back to single transaction: {e}")
+            yield _Step('run', self.METRICS_QUERY)
+            self.logger.info("Updated customer metrics")
+            return
+        
+        # apoc.periodic.iterate reports failed batches instead of raising
+        if record["failedBatches"]:
+            raise RuntimeError(f"{record['failedBatches']} customer metrics batches failed: {record['errorMessages']}")
+        self.logger.info(f"Updated customer metrics in {record['batches']} batches")
+    
+    def _analytics_steps(self):
+        try:
+            yield _Step('run', self.ANALYTICS_DROP_QUERY)
+            yield _Step('run', self.ANALYTICS_PROJECTION_QUERY)
+            self.logger.info("Created graph projection")
+            
+            for name, query in self.ANALYTICS_QUERIES.items():
+                try:
+                    # Write-mode calls only need completion, so don't keep the stats row
+                    yield _Step('run', query)
+                    self.logger.info(f"Completed {name} analysis")
+                except Exception as e:
+                    self.logger.warning(f"Analytics {name} failed: {e}")
+            
+            yield _Step('run', self.ANALYTICS_DROP_QUERY)
+        
+        except Exception as e:
+            self.logger.warning(f"Graph projection failed: {e}")
+
+class GraphETLPipeline(_PipelineStages):
     def __init__(self, neo4j_uri: str, neo4j_user: str, neo4j_password: str):
         """Initialize Graph ETL Pipeline"""
         self.driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
         self.logger = logging.getLogger(__name__)
-        
+        self._shared_session = None
+    
     def close(self):
         """Close Neo4j connection"""
+        if self._shared_session is not None:
+            self._shared_session.close()
+            self._shared_session = None
         self.driver.close()
     
+    @contextmanager
+    def _session(self):
+        """Yield the pipeline's long-lived session, opening it on first use (not thread-safe)"""
+        if self._shared_session is None:
+            self._shared_session = self.driver.session()
+        yield self._shared_session
+    
+    def _execute(self, session, step: _Step):
+        """Execute one step on session and return its result"""
+        if step.kind == 'write':
+            return session.execute_write(lambda tx: tx.run(step.query, **step.params).consume())
+        result = session.run(step.query, **step.params)
+        return result.single() if step.kind == 'single' else result.consume()
+    
+    def _drive(self, steps, session=None):
+        """Run a stage's steps on session (the shared session by default) and return the stage's result"""
+        if session is None:
+            with self._session() as session:
+                return self._drive(steps, session)
+        reply, error = None, None
+        while True:
+            try:
+                step = steps.throw(error) if error is not None else steps.send(reply)
+            except StopIteration as stop:
+                return stop.value
+            reply, error = None, None
+            try:
+                reply = self._execute(session, step)
+            except Exception as e:
+                error = e
+    
     def clear_database(self):
         """Clear all nodes and relationships"""
-        with self.driver.session() as session:
-            session.run("MATCH (n) DETACH DELETE n")
-            self.logger.info("Database cleared")
+        self._drive(self._clear_database_steps())
     
     def create_constraints(self):
         """Create unique constraints for better performance"""
-        constraints = [
-            "CREATE CONSTRAINT customer_id IF NOT EXISTS FOR (c:Customer) REQUIRE c.id IS UNIQUE",
-            "CREATE CONSTRAINT product_id IF NOT EXISTS FOR (p:Product) REQUIRE p.id IS UNIQUE",
-            "CREATE CONSTRAINT order_id IF NOT EXISTS FOR (o:Order) REQUIRE o.id IS UNIQUE",
-            "CREATE CONSTRAINT employee_id IF NOT EXISTS FOR (e:Employee) REQUIRE e.id IS UNIQUE"
-        ]
+        self._drive(self._create_constraints_steps())
+    
+    def _run_batches(self, query: str, rows: Iterable[Dict[str, Any]], key: str, batch_size: int = 1000) -> int:
+        """Run an UNWIND query over rows in batches, one managed write transaction per batch"""
+        return self._drive(self._batch_steps(query, rows, key, batch_size))
+    
+    def _parallel_ingest(self, query: str, df: pd.DataFrame, cols: Sequence[str], key: str,
+                         shard_col: str, workers: int = 8, batch: int = 2000, retries: int = 3) -> int:
+        """Run an UNWIND query over df sharded by shard_col across worker threads, each with its own session"""
+        # Set when any shard fails so the others stop after their current batch instead of loading everything
+        stop = threading.Event()
         
-        with self.driver.session() as session:
-            for constraint in constraints:
-                try:
-                    session.run(constraint)
-                    self.logger.info(f"Created constraint: {constraint}")
-                except Exception as e:
-                    self.logger.warning(f"Constraint may already exist: {e}")
+        def ingest_shard(shard_df: pd.DataFrame):
+            try:
+                with self.driver.session() as session:
+                    self._drive(self._batch_steps(query, _iter_records(shard_df, cols), key, batch, retries, stop),
+                                session)
+            except Exception:
+                stop.set()
+                raise
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(ingest_shard, shard_df) for shard_df in _shards(df, shard_col, workers)]
+            for future in futures:
+                future.result()
+        return len(df)
     
     def load_customers(self, customers_df: pd.DataFrame):
         """Load customer nodes"""
-        query = """
-        UNWIND $customers AS customer
-        CREATE (c:Customer {
-            id: customer.id,
-            name: customer.name,
-            email: customer.email,
-            city: customer.city,
-            country: customer.country,
-            segment: customer.segment,
-            registration_date: date(customer.registration_date),
-            lifetime_value: customer.lifetime_value
-        })
-        """
-        
-        customers_data = customers_df.to_dict('records')
-        with self.driver.session() as session:
-            session.run(query, customers=customers_data)
-            self.logger.info(f"Loaded {len(customers_data)} customers")
+        self._drive(self._load_customers_steps(customers_df))
     
     def load_products(self, products_df: pd.DataFrame):
         """Load product nodes with categories"""
-        # Create products
-        query = """
-        UNWIND $products AS product
-        CREATE (p:Product {
-            id: product.id,
-            name: product.name,
-            category: product.category,
-            price: product.price,
-            cost: product.cost,
-            margin: product.margin,
-            launch_date: date(product.launch_date)
-        })
-        """
+        self._drive(self._load_products_steps(products_df))
+    
+    def load_orders(self, orders_df: pd.DataFrame, workers: int = 8):
+        """Load order nodes and relationships"""
+        # Shard by customer so concurrent batches never write PLACED edges on the same customer
+        loaded = self._parallel_ingest(self.ORDER_QUERY, _prepare_orders(orders_df), self.ORDER_COLS, "orders",
+                                       shard_col='customer_id', workers=workers, batch=5000)
+        self.logger.info(f"Loaded {loaded} orders with relationships")
+    
+    def load_orders_stream(self, path: str, chunksize: int = 50000):
+        """Load orders from a CSV in chunks, parsing the next chunk while the current one is written"""
+        chunks = queue.Queue(maxsize=2)
+        stop = threading.Event()
+        done = object()
+        
+        def put(item) -> bool:
+            # Poll so the reader notices a stopped writer instead of blocking on a full queue forever
+            while not stop.is_set():
+                try:
+                    chunks.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    pass
+            return False
         
-        products_data = products_df.to_dict('records')
-        with self.driver.session() as session:
-            session.run(query, products=products_data)
-            self.logger.info(f"Loaded {len(products_data)} products")
+        def produce():
+            try:
+                with pd.read_csv(path, usecols=self.ORDER_COLS, chunksize=chunksize) as reader:
+                    for chunk in reader:
+                        if not put(chunk):
+                            return
+            except Exception as e:
+                put(e)
+            else:
+                put(done)
         
-        # Create category relationships
-        category_query = """
-        MATCH (p:Product)
-        MERGE (c:Category {name: p.category})
-        MERGE (p)-[:BELONGS_TO]->(c)
-        """
+        producer = threading.Thread(target=produce, name="orders-csv-reader")
+        producer.start()
+        
+        loaded = 0
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is done:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+                chunk = _prepare_orders(chunk)
+                loaded += self._run_batches(self.ORDER_QUERY, _iter_records(chunk, self.ORDER_COLS), "orders",
+                                            batch_size=5000)
+                self.logger.info(f"Streamed {loaded} orders")
+        finally:
+            stop.set()
+            producer.join()
         
-        with self.driver.session() as session:
-            session.run(category_query)
-            self.logger.info("Created product-category relationships")
+        self.logger.info(f"Loaded {loaded} orders with relationships from {path}")
     
-    def load_orders(self, orders_df: pd.DataFrame):
-        """Load order nodes and relationships"""
-        query = """
-        UNWIND $orders AS order
-        MATCH (c:Customer {id: order.customer_id})
-        MATCH (p:Product {id: order.product_id})
-        CREATE (o:Order {
-            id: order.id,
-            order_date: date(order.order_date),
-            quantity: order.quantity,
-            unit_price: order.unit_price,
-            total_amount: order.total_amount,
-            discount: order.discount
-        })
-        CREATE (c)-[:PLACED]->(o)
-        CREATE (o)-[:CONTAINS]->(p)
+    def bulk_load_csv(self, customers_df: pd.DataFrame, products_df: pd.DataFrame,
+                      orders_df: pd.DataFrame, import_dir: str):
+        """Cold-load an empty database via LOAD CSV from the server's import directory
+        
+        import_dir must be the Neo4j server's import/ directory, and the server needs
+        dbms.security.allow_csv_import_from_file_urls=true. Use the load_* methods for
+        incremental updates. Constraints are created first so the orders load seeks
+        customers and products by index.
         """
+        self.create_constraints()
+        
+        _format_dates(customers_df, ['registration_date'])[self.CUSTOMER_COLS].to_csv(
+            os.path.join(import_dir, 'customers.csv'), index=False)
+        _format_dates(products_df, ['launch_date'])[self.PRODUCT_COLS].to_csv(
+            os.path.join(import_dir, 'products.csv'), index=False)
+        orders_df = orders_df.sort_values(['customer_id', 'product_id'], kind='mergesort')
+        _format_dates(orders_df, ['order_date'])[self.ORDER_COLS].to_csv(
+            os.path.join(import_dir, 'orders.csv'), index=False)
         
-        orders_data = orders_df.to_dict('records')
-        with self.driver.session() as session:
-            session.run(query, orders=orders_data)
-            self.logger.info(f"Loaded {len(orders_data)} orders with relationships")
+        load_queries = {
+            "customers": """
+                LOAD CSV WITH HEADERS FROM 'file:///customers.csv' AS r
+                CALL {
+                    WITH r
+                    CREATE (:Customer {
+                        id: toInteger(r.id),
+                        name: r.name,
+                        email: r.email,
+                        city: r.city,
+                        country: r.country,
+                        segment: r.segment,
+                        registration_date: date(r.registration_date),
+                        lifetime_value: toFloat(r.lifetime_value)
+                    })
+                } IN TRANSACTIONS OF 50000 ROWS
+            """,
+            "products": """
+                LOAD CSV WITH HEADERS FROM 'file:///products.csv' AS r
+                CALL {
+                    WITH r
+                    CREATE (p:Product {
+                        id: toInteger(r.id),
+                        name: r.name,
+                        category: r.category,
+                        price: toFloat(r.price),
+                        cost: toFloat(r.cost),
+                        margin: toFloat(r.margin),
+                        launch_date: date(r.launch_date)
+                    })
+                    MERGE (c:Category {name: r.category})
+                    MERGE (p)-[:BELONGS_TO]->(c)
+                } IN TRANSACTIONS OF 50000 ROWS
+            """,
+            "orders": """
+                LOAD CSV WITH HEADERS FROM 'file:///orders.csv' AS r
+                CALL {
+                    WITH r
+                    MATCH (c:Customer {id: toInteger(r.customer_id)})
+                    MATCH (p:Product {id: toInteger(r.product_id)})
+                    CREATE (o:Order {
+                        id: toInteger(r.id),
+                        order_date: date(r.order_date),
+                        quantity: toInteger(r.quantity),
+                        unit_price: toFloat(r.unit_price),
+                        total_amount: toFloat(r.total_amount),
+                        discount: toFloat(r.discount)
+                    })
+                    CREATE (c)-[:PLACED]->(o)
+                    CREATE (o)-[:CONTAINS]->(p)
+                } IN TRANSACTIONS OF 50000 ROWS
+            """
+        }
+        
+        # CALL { } IN TRANSACTIONS only runs in an auto-commit transaction, so use session.run
+        with self._session() as session:
+            for name, query in load_queries.items():
+                summary = session.run(query).consume()
+                self.logger.info(f"Bulk loaded {name}: {summary.counters.nodes_created} nodes created")
     
     def create_customer_similarity_relationships(self):
-        """Create SIMILAR_TO relationships between customers based on purchase behavior"""
-        query = """
-        MATCH (c1:Customer)-[:PLACED]->(:Order)-[:CONTAINS]->(p:Product)
-        MATCH (c2:Customer)-[:PLACED]->(:Order)-[:CONTAINS]->(p)
-        WHERE c1.id < c2.id
-        WITH c1, c2, count(p) as common_products
-        WHERE common_products >= 2
-        CREATE (c1)-[:SIMILAR_TO {strength: common_products}]->(c2)
+        """Create SIMILAR_TO relationships between customers based on purchase behavior
+        
+        strength is the integer count of shared products (at least 2), one edge per customer pair.
         """
+        self._drive(self._similarity_steps())
+    
+    def create_customer_similarity_gds(self):
+        """Create SIMILAR_TO relationships with GDS node similarity over a customer-product projection
         
-        with self.driver.session() as session:
-            result = session.run(query)
-            self.logger.info("Created customer similarity relationships")
+        strength is the Jaccard similarity of the two customers' product sets (at least 0.1), for each
+        customer's top 20 neighbours, written in both directions. This differs from the shared-product
+        count of create_customer_similarity_relationships, so failures are raised rather than falling back;
+        use has_gds() to choose between the two.
+        """
+        self._drive(self._similarity_gds_steps())
+    
+    def has_gds(self) -> bool:
+        """Check whether the Graph Data Science library is installed on the server"""
+        return self._drive(self._has_gds_steps())
     
     def create_product_co_purchase_relationships(self):
         """Create CO_PURCHASED relationships between products"""
-        query = """
-        MATCH (p1:Product)<-[:CONTAINS]-(:Order)<-[:PLACED]-(c:Customer)
-        MATCH (c)-[:PLACED]->(:Order)-[:CONTAINS]->(p2:Product)
-        WHERE p1.id < p2.id
-        WITH p1, p2, count(c) as co_purchases
-        WHERE co_purchases >= 2
-        CREATE (p1)-[:CO_PURCHASED {frequency: co_purchases}]->(p2)
-        """
-        
-        with self.driver.session() as session:
-            result = session.run(query)
-            self.logger.info("Created product co-purchase relationships")
+        self._drive(self._co_purchase_steps())
     
     def calculate_customer_metrics(self):
         """Calculate and store customer metrics"""
-        query = """
-        MATCH (c:Customer)-[:PLACED]->(o:Order)
-        WITH c, 
-             count(o) as total_orders,
-             sum(o.total_amount) as total_spent,
-             avg(o.total_amount) as avg_order_value,
-             max(o.order_date) as last_order_date
-        SET c.total_orders = total_orders,
-            c.total_spent = total_spent,
-            c.avg_order_value = avg_order_value,
-            c.last_order_date = last_order_date,
-            c.customer_tier = CASE 
-                WHEN total_spent > 5000 THEN 'VIP'
-                WHEN total_spent > 2000 THEN 'Premium'
-                ELSE 'Standard'
-            END
-        """
-        
-        with self.driver.session() as session:
-            session.run(query)
-            self.logger.info("Updated customer metrics")
+        self._drive(self._metrics_steps())
     
     def run_graph_analytics(self):
         """Run various graph analytics algorithms"""
-        analytics_queries = {
-            "pagerank": """
-                CALL gds.pageRank.write('customer-similarity', {
-                    writeProperty: 'pagerank'
-                })
-                YIELD nodePropertiesWritten
-                RETURN nodePropertiesWritten
-            """,
-            "community_detection": """
-                CALL gds.louvain.write('customer-similarity', {
-                    writeProperty: 'community'
-                })
-                YIELD communityCount, nodePropertiesWritten
-                RETURN communityCount, nodePropertiesWritten
-            """,
-            "centrality": """
-                CALL gds.betweenness.write('customer-similarity', {
-                    writeProperty: 'betweenness'
-                })
-                YIELD nodePropertiesWritten
-                RETURN nodePropertiesWritten
-            """
-        }
-        
-        # First create graph projection
-        projection_query = """
-        CALL gds.graph.project(
-            'customer-similarity',
-            'Customer',
-            'SIMILAR_TO',
-            {
-                relationshipProperties: 'strength'
-            }
-        )
-        """
-        
-        with self.driver.session() as session:
+        self._drive(self._analytics_steps())
+
+class AsyncGraphETLPipeline(_PipelineStages):
+    """Asyncio variant of GraphETLPipeline so independent stages can overlap on Bolt I/O
+    
+    Covers the in-memory DataFrame pipeline run by async_main; bulk_load_csv and
+    load_orders_stream are only available on GraphETLPipeline.
+    """
+    
+    def __init__(self, neo4j_uri: str, neo4j_user: str, neo4j_password: str):
+        """Initialize async Graph ETL Pipeline"""
+        self.driver = AsyncGraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
+        self.logger = logging.getLogger(__name__)
+    
+    async def close(self):
+        """Close Neo4j connection"""
+        await self.driver.close()
+    
+    async def _execute(self, session, step: _Step):
+        """Execute one step on session and return its result"""
+        if step.kind == 'write':
+            async def work(tx):
+                result = await tx.run(step.query, **step.params)
+                return await result.consume()
+            return await session.execute_write(work)
+        result = await session.run(step.query, **step.params)
+        return await (result.single() if step.kind == 'single' else result.consume())
+    
+    async def _drive(self, steps, session=None):
+        """Run a stage's steps on session (a new session by default, so stages can overlap)"""
+        if session is None:
+            async with self.driver.session() as session:
+                return await self._drive(steps, session)
+        reply, error = None, None
+        while True:
             try:
-                session.run(projection_query)
-                self.logger.info("Created graph projection")
-                
-                for name, query in analytics_queries.items():
-                    try:
-                        result = session.run(query)
-                        self.logger.info(f"Completed {name} analysis")
-                    except Exception as e:
-                        self.logger.warning(f"Analytics {name} failed: {e}")
-                        
+                step = steps.throw(error) if error is not None else steps.send(reply)
+            except StopIteration as stop:
+                return stop.value
+            reply, error = None, None
+            try:
+                reply = await self._execute(session, step)
             except Exception as e:
-                self.logger.warning(f"Graph projection failed: {e}")
+                error = e
+    
+    async def clear_database(self):
+        """Clear all nodes and relationships"""
+        await self._drive(self._clear_database_steps())
+    
+    async def create_constraints(self):
+        """Create unique constraints for better performance"""
+        await self._drive(self._create_constraints_steps())
+    
+    async def _parallel_ingest(self, query: str, df: pd.DataFrame, cols: Sequence[str], key: str,
+                               shard_col: str, workers: int = 8, batch: int = 2000, retries: int = 3) -> int:
+        """Run an UNWIND query over df sharded by shard_col across concurrent sessions"""
+        async def ingest_shard(shard_df: pd.DataFrame):
+            await self._drive(self._batch_steps(query, _iter_records(shard_df, cols), key, batch, retries))
+        
+        await _gather_cancelling(*(ingest_shard(shard_df) for shard_df in _shards(df, shard_col, workers)))
+        return len(df)
+    
+    async def load_customers(self, customers_df: pd.DataFrame):
+        """Load customer nodes"""
+        await self._drive(self._load_customers_steps(customers_df))
+    
+    async def load_products(self, products_df: pd.DataFrame):
+        """Load product nodes with categories"""
+        await self._drive(self._load_products_steps(products_df))
+    
+    async def load_orders(self, orders_df: pd.DataFrame, workers: int = 8):
+        """Load order nodes and relationships"""
+        loaded = await self._parallel_ingest(self.ORDER_QUERY, _prepare_orders(orders_df), self.ORDER_COLS, "orders",
+                                             shard_col='customer_id', workers=workers, batch=5000)
+        self.logger.info(f"Loaded {loaded} orders with relationships")
+    
+    async def create_customer_similarity_relationships(self):
+        """Create SIMILAR_TO relationships (see GraphETLPipeline.create_customer_similarity_relationships)"""
+        await self._drive(self._similarity_steps())
+    
+    async def create_customer_similarity_gds(self):
+        """Create SIMILAR_TO relationships with GDS node similarity (see GraphETLPipeline.create_customer_similarity_gds)"""
+        await self._drive(self._similarity_gds_steps())
+    
+    async def has_gds(self) -> bool:
+        """Check whether the Graph Data Science library is installed on the server"""
+        return await self._drive(self._has_gds_steps())
+    
+    async def create_product_co_purchase_relationships(self):
+        """Create CO_PURCHASED relationships between products"""
+        await self._drive(self._co_purchase_steps())
+    
+    async def calculate_customer_metrics(self):
+        """Calculate and store customer metrics"""
+        await self._drive(self._metrics_steps())
+    
+    async def run_graph_analytics(self):
+        """Run various graph analytics algorithms"""
+        await self._drive(self._analytics_steps())
+
+def generate_sample_data() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Generate sample customers, products and orders"""
+    # One location draw indexes both lookups so each city keeps its own country
+    location_idx = np.random.randint(0, 4, 100)
+    customers_df = pd.DataFrame({
+        'id': range(1, 101),
+        'name': [f'Customer {i}' for i in range(1, 101)],
+        'email': [f'customer{i}@example.com' for i in range(1, 101)],
+        'city': pd.Categorical.from_codes(location_idx, ['New York', 'London', 'Tokyo', 'Sydney']),
+        'country': pd.Categorical.from_codes(location_idx, ['USA', 'UK', 'Japan', 'Australia']),
+        'segment': pd.Categorical.from_codes(np.random.randint(0, 3, 100), ['Enterprise', 'SMB', 'Consumer']),
+        'registration_date': pd.date_range('2020-01-01', periods=100, freq='D'),
+        'lifetime_value': np.random.uniform(100, 10000, 100)
+    })
+    
+    products_df = pd.DataFrame({
+        'id': range(1, 21),
+        'name': [f'Product {i}' for i in range(1, 21)],
+        'category': np.random.choice(['Electronics', 'Clothing', 'Books', 'Home'], 20),
+        'price': np.random.uniform(10, 1000, 20),
+        'cost': np.random.uniform(5, 500, 20),
+        'margin': np.random.uniform(0.1, 0.5, 20),
+        'launch_date': pd.date_range('2019-01-01', periods=20, freq='M')
+    })
+    
+    # Generate orders
+    n_orders = 200
+    orders_df = pd.DataFrame({
+        'id': np.arange(1, n_orders + 1),
+        'customer_id': np.random.randint(1, 101, n_orders),
+        'product_id': np.random.randint(1, 21, n_orders),
+        'order_date': pd.Timestamp('2023-01-01') + pd.to_timedelta(np.random.randint(0, 365, n_orders), unit='D'),
+        'quantity': np.random.randint(1, 5, n_orders),
+        'unit_price': np.random.uniform(10, 1000, n_orders),
+        'total_amount': np.random.uniform(10, 5000, n_orders),
+        'discount': np.random.uniform(0, 0.3, n_orders)
+    })
+    
+    return customers_df, products_df, orders_df
 
 def main():
     """Main ETL execution"""
@@ -240,50 +762,19 @@ def main():
         pipeline.create_constraints()
         
         # Load sample data (you would replace with actual data loading)
-        customers_df = pd.DataFrame({
-            'id': range(1, 101),
-            'name': [f'Customer {i}' for i in range(1, 101)],
-            'email': [f'customer{i}@example.com' for i in range(1, 101)],
-            'city': np.random.choice(['New York', 'London', 'Tokyo', 'Sydney'], 100),
-            'country': np.random.choice(['USA', 'UK', 'Japan', 'Australia'], 100),
-            'segment': np.random.choice(['Enterprise', 'SMB', 'Consumer'], 100),
-            'registration_date': pd.date_range('2020-01-01', periods=100, freq='D'),
-            'lifetime_value': np.random.uniform(100, 10000, 100)
-        })
-        
-        products_df = pd.DataFrame({
-            'id': range(1, 21),
-            'name': [f'Product {i}' for i in range(1, 21)],
-            'category': np.random.choice(['Electronics', 'Clothing', 'Books', 'Home'], 20),
-            'price': np.random.uniform(10, 1000, 20),
-            'cost': np.random.uniform(5, 500, 20),
-            'margin': np.random.uniform(0.1, 0.5, 20),
-            'launch_date': pd.date_range('2019-01-01', periods=20, freq='M')
-        })
-        
-        # Generate orders
-        orders_data = []
-        for i in range(1, 201):
-            orders_data.append({
-                'id': i,
-                'customer_id': np.random.randint(1, 101),
-                'product_id': np.random.randint(1, 21),
-                'order_date': pd.Timestamp('2023-01-01') + pd.Timedelta(days=np.random.randint(0, 365)),
-                'quantity': np.random.randint(1, 5),
-                'unit_price': np.random.uniform(10, 1000),
-                'total_amount': np.random.uniform(10, 5000),
-                'discount': np.random.uniform(0, 0.3)
-            })
-        
-        orders_df = pd.DataFrame(orders_data)
+        customers_df, products_df, orders_df = generate_sample_data()
         
         # Load data
         pipeline.load_customers(customers_df)
         pipeline.load_products(products_df)
         pipeline.load_orders(orders_df)
         
-        # Create relationships
-        pipeline.create_customer_similarity_relationships()
+        # Create relationships; SIMILAR_TO.strength differs between the two methods, so say which one ran
+        if pipeline.has_gds():
+            pipeline.create_customer_similarity_gds()
+        else:
+            logging.warning("GDS not installed: building SIMILAR_TO with Cypher (strength = shared-product count)")
+            pipeline.create_customer_similarity_relationships()
         pipeline.create_product_co_purchase_relationships()
         
         # Calculate metrics
@@ -293,9 +784,59 @@ def main():
         pipeline.run_graph_analytics()
         
         print("Graph ETL pipeline completed successfully!")
-        
+    
     finally:
         pipeline.close()
 
+async def async_main():
+    """Main ETL execution, overlapping independent stages"""
+    logging.basicConfig(level=logging.INFO)
+    
+    # Initialize pipeline
+    pipeline = AsyncGraphETLPipeline("bolt://localhost:7687", "neo4j", "password")
+    
+    try:
+        # Clear and setup
+        await pipeline.clear_database()
+        await pipeline.create_constraints()
+        
+        # Load sample data (you would replace with actual data loading)
+        customers_df, products_df, orders_df = generate_sample_data()
+        
+        # Customers and products are independent; orders need both
+        await _gather_cancelling(
+            pipeline.load_customers(customers_df),
+            pipeline.load_products(products_df)
+        )
+        await pipeline.load_orders(orders_df)
+        
+        # Similarity writes lock Customers and co-purchase writes lock Products, so they can overlap;
+        # metrics also write Customers and would contend with similarity, so they run after
+        if await pipeline.has_gds():
+            similarity = pipeline.create_customer_similarity_gds()
+        else:
+            logging.warning("GDS not installed: building SIMILAR_TO with Cypher (strength = shared-product count)")
+            similarity = pipeline.create_customer_similarity_relationships()
+        await _gather_cancelling(
+            similarity,
+            pipeline.create_product_co_purchase_relationships()
+        )
+        await pipeline.calculate_customer_metrics()
+        
+        # Run analytics
+        await pipeline.run_graph_analytics()
+        
+        print("Graph ETL pipeline completed successfully!")
+    
+    finally:
+        await pipeline.close()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Graph ETL pipeline")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="overlap independent stages using the asyncio driver")
+    args = parser.parse_args()
+    if args.use_async:
+        asyncio.run(async_main())
+    else:
+        main()